@@ -1,12 +1,17 @@
 #!/usr/bin/env python3
+import argparse
 import csv
+import hashlib
 import json
 import os
 import sys
 import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from difflib import SequenceMatcher
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Set, Tuple
 from datetime import date, datetime
 import shutil
 import re
@@ -27,6 +32,11 @@ INPUT_DIR = Path("input")
 MODEL_NAME = "gpt-5-mini"
 DEFAULT_ROWS_TO_PROCESS = 5
 
+# watch mode (python factory_runner.py --watch)
+STATUS_PATH = Path("factory_status.json")
+WATCH_POLL_INTERVAL = 2.0
+WATCH_RECENT_RESULTS = 20
+
 # column 9 (1-based) -> index 8 (0-based)
 DATE_COLUMN_INDEX = 8
 
@@ -130,12 +140,23 @@ def string_similarity(a: str, b: str) -> float:
     return SequenceMatcher(None, a, b).ratio()
 
 
+def ensure_input_placeholder(input_root: Path, slug: str) -> None:
+    """
+    Create input/<slug>/manifest.json with no results if the folder is missing.
+    """
+    input_folder = input_root / slug
+    if not input_folder.exists():
+        input_folder.mkdir(parents=True, exist_ok=True)
+        (input_folder / "manifest.json").write_text('{"results":[]}', encoding="utf-8")
+
+
 def find_best_prompt_file_for_row(
     slug: str,
     row: List[str],
     prompts_dir: Path,
     input_root: Path,
     similarity_threshold: float = 0.65,
+    create_placeholder: bool = True,
 ) -> Path:
     """
     Trova il file prompt 'giusto' per uno slug, usando:
@@ -144,6 +165,7 @@ def find_best_prompt_file_for_row(
       - controllo che esista anche la cartella input corrispondente.
 
     Se non trova un match sufficientemente buono → solleva RuntimeError.
+    Con create_placeholder=False non scrive nulla su disco (indicizzazione).
     """
 
     if not prompts_dir.exists():
@@ -171,11 +193,9 @@ def find_best_prompt_file_for_row(
 
         direct_matches.sort(key=direct_score)
         best_direct = direct_matches[0]
-        input_folder = input_root / slug
-        if not input_folder.exists():
+        if create_placeholder:
             # create placeholder to avoid hard stops
-            input_folder.mkdir(parents=True, exist_ok=True)
-            (input_folder / "manifest.json").write_text('{"results":[]}', encoding="utf-8")
+            ensure_input_placeholder(input_root, slug)
         return best_direct
 
     # 1) Tentativi “ovvi” di nome file
@@ -190,10 +210,9 @@ def find_best_prompt_file_for_row(
     for name in candidates_exact:
         p = prompts_dir / name
         if p.exists():
-            input_folder = input_root / slug  # es. input/price-elasticity-calculator
-            if not input_folder.exists():
-                input_folder.mkdir(parents=True, exist_ok=True)
-                (input_folder / "manifest.json").write_text('{"results":[]}', encoding="utf-8")
+            if create_placeholder:
+                # es. input/price-elasticity-calculator
+                ensure_input_placeholder(input_root, slug)
             return p
 
     # 2) Fuzzy intelligente sul core del nome file
@@ -226,10 +245,8 @@ def find_best_prompt_file_for_row(
         )
 
     # Ensure input folder exists; create placeholder if missing
-    input_folder = input_root / slug
-    if not input_folder.exists():
-        input_folder.mkdir(parents=True, exist_ok=True)
-        (input_folder / "manifest.json").write_text('{"results":[]}', encoding="utf-8")
+    if create_placeholder:
+        ensure_input_placeholder(input_root, slug)
 
     return best_file
 
@@ -437,13 +454,150 @@ def slug_has_build_error(build_log: str, slug: str) -> bool:
     return False
 
 
+# ------------ HELPER FUNCTIONS: GENERATION ------------
+
+def context_folder_name_from_prompt(prompt_json: Dict[str, Any]) -> Optional[str]:
+    """
+    Map the zip reference inside a prompt JSON to its folder under input/.
+    Example: "../input/xyz.zip" → "xyz"
+    """
+    zip_str = find_zip_path_in_json(prompt_json)
+    if not zip_str:
+        return None
+
+    norm = zip_str.strip()
+
+    # ALWAYS convert "../input/xyz.zip" → "./input/xyz/"
+    if norm.startswith("../input/"):
+        base = norm[len("../input/"):]
+    else:
+        base = Path(norm).name  # fallback: take only last part
+
+    return base.replace(".zip", "")  # "xyz.zip" → "xyz"
+
+
+def collect_context_files(prompt_json: Dict[str, Any]) -> List[Path]:
+    context_files: List[Path] = []
+
+    folder_name = context_folder_name_from_prompt(prompt_json)
+    if folder_name is None:
+        print("  -> No zip reference found; using prompt only.")
+        return context_files
+
+    folder_path = Path.cwd() / INPUT_DIR / folder_name
+
+    if folder_path.exists() and folder_path.is_dir():
+        print(f"  -> Using folder for context: {folder_path}")
+        # Collect all supported files inside folder
+        for p in folder_path.rglob("*"):
+            if p.is_file() and p.suffix.lower() in SUPPORTED_CONTEXT_EXTENSIONS:
+                context_files.append(p)
+                print(f"     + Adding context file: {p.name}")
+    else:
+        print(f"  -> Folder not found: {folder_path}. No context files added.")
+
+    return context_files
+
+
+def generate_config_for_slug(
+    client: OpenAI,
+    slug: str,
+    row: List[str],
+    prompt_file: Optional[Path] = None,
+) -> Optional[Path]:
+    """
+    Run prompt → OpenAI → JSON for one slug and save data/configs/<slug>.json.
+
+    Returns the saved config path, or None if the row was skipped.
+    Prompt matching errors are raised as RuntimeError: the caller decides
+    whether to stop (batch mode) or keep going (watch mode).
+    """
+    if prompt_file is None:
+        prompt_file = find_best_prompt_file_for_row(slug, row, PROMPTS_DIR, INPUT_DIR)
+
+    print(f"  -> Using prompt file: {prompt_file}")
+
+    try:
+        prompt_json = load_json(prompt_file)
+    except Exception as e:
+        print(f"  -> ERROR loading JSON from {prompt_file}: {e}")
+        return None
+
+    prompt_text = prompt_json.get("prompt")
+    if not prompt_text or not isinstance(prompt_text, str):
+        print(f"  -> No 'prompt' field found in JSON {prompt_file}. Skipping.")
+        return None
+
+    context_files = collect_context_files(prompt_json)
+
+    try:
+        raw_output = call_openai_with_prompt_and_context_files(client, prompt_text, context_files)
+    except Exception as e:
+        print(f"  -> ERROR calling OpenAI for slug '{slug}': {e}")
+        return None
+
+    cleaned_json_str = extract_json_block_with_version(raw_output)
+
+    if cleaned_json_str is None:
+        debug_path = OUTPUT_DIR / f"{slug}_raw_output.txt"
+        with debug_path.open("w", encoding="utf-8") as f:
+            f.write(raw_output)
+        print('  -> ERROR: No JSON block with "version" found in model output.')
+        print(f"     Full model output saved to: {debug_path}")
+        print("     Controlla cosa sta producendo il modello e sistema il prompt per forzare un JSON valido.")
+        return None
+
+    # Validate JSON structure
+    try:
+        parsed = json.loads(cleaned_json_str)
+    except Exception as e:
+        print(f"  -> ERROR: Extracted text is not valid JSON: {e}")
+        print("     Skipping save for this slug – fix prompt or model output and retry.")
+        return None
+
+    output_text_to_save = json.dumps(parsed, indent=2, ensure_ascii=False)
+
+    output_path = OUTPUT_DIR / f"{slug}.json"
+    with output_path.open("w", encoding="utf-8") as f:
+        f.write(output_text_to_save)
+
+    print(f"  -> Saved config to {output_path}")
+    return output_path
+
+
+def mark_rows_as_built(rows: List[List[str]], data_row_indices: List[int]) -> None:
+    """
+    Write today's date in column 9 for the given data rows and save calc.csv.
+    rows = [header, *data_rows]; data_rows indexes are shifted by 1.
+    """
+    today_str = date.today().strftime("%m/%d/%Y")
+
+    print("\nUpdating calc.csv for successful rows with date:", today_str)
+
+    for idx in data_row_indices:
+        csv_row_index = idx + 1  # +1 because of header
+        row = rows[csv_row_index]
+
+        # Ensure the row has at least DATE_COLUMN_INDEX+1 elements
+        if len(row) <= DATE_COLUMN_INDEX:
+            # Extend with empty strings if needed
+            row.extend([""] * (DATE_COLUMN_INDEX + 1 - len(row)))
+
+        row[DATE_COLUMN_INDEX] = today_str
+        rows[csv_row_index] = row
+        print(f"  -> Row {idx + 1} (data row) updated, column 9 set to {today_str}")
+
+    write_csv_rows(rows, CSV_PATH)
+    print("calc.csv updated.")
+
+
 # ------------ HELPER FUNCTIONS: GIT ------------
 
-def run_git_commands(start_row_number: int) -> None:
+def run_git_commands(commit_msg: str) -> None:
     """
     Run:
       git add .
-      git commit -m "row {start_row_number}"
+      git commit -m "{commit_msg}"
       git push -u origin main
     """
     if os.environ.get("SKIP_GIT_PUSH") == "1":
@@ -452,7 +606,6 @@ def run_git_commands(start_row_number: int) -> None:
 
     try:
         subprocess.run(["git", "add", "."], check=True)
-        commit_msg = f"row {start_row_number}"
         subprocess.run(["git", "commit", "-m", commit_msg], check=True)
         subprocess.run(["git", "push", "-u", "origin", "main"], check=True)
     except subprocess.CalledProcessError as e:
@@ -460,9 +613,563 @@ def run_git_commands(start_row_number: int) -> None:
         print(f"WARNING: git command failed (likely missing credentials). Continuing without push. Details: {e}")
 
 
+# ------------ WATCH MODE ------------
+
+def scan_mtimes(root: Path, pattern: str = "*") -> Dict[Path, float]:
+    """
+    Return {path: mtime} for every file under root matching pattern.
+    Missing root → empty dict.
+    """
+    if not root.exists():
+        return {}
+    mtimes: Dict[Path, float] = {}
+    for p in root.rglob(pattern):
+        try:
+            if p.is_file():
+                mtimes[p] = p.stat().st_mtime
+        except OSError:
+            # file removed between rglob and stat
+            continue
+    return mtimes
+
+
+def file_mtime(path: Path) -> Optional[float]:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return None
+
+
+def row_signature(row: List[str]) -> Tuple[str, ...]:
+    """
+    Row content used to detect edits in calc.csv.
+    The date column is excluded: the runner writes it itself.
+    """
+    return tuple(cell for i, cell in enumerate(row) if i != DATE_COLUMN_INDEX)
+
+
+def prompt_file_signature(path: Path) -> Tuple[str, Optional[str]]:
+    """
+    Return (hash, context folder) for a prompt file.
+
+    Only what reaches the model is hashed: the `prompt` field and the
+    input/ folder named by the zip reference. Rewriting a file with the
+    same values (generate-prompts.js does it for every file) is not a change.
+    """
+    try:
+        data = load_json(path)
+    except (OSError, ValueError):
+        # half-written or broken JSON: hash the bytes so the fix is still seen
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            raw = b""
+        return hashlib.sha256(raw).hexdigest(), None
+
+    if not isinstance(data, dict):
+        data = {}
+    folder = context_folder_name_from_prompt(data)
+    payload = json.dumps([data.get("prompt"), folder], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest(), folder
+
+
+class FactoryDaemon:
+    """
+    Long-running version of main(): keeps the OpenAI client, calc.csv,
+    the build log and the slug → prompt file → input folder matches in
+    memory, polls the inputs and regenerates only the slugs affected by
+    a change:
+
+      - data/calc.csv       → new rows, edited rows
+      - generated/prompts/  → prompt text or zip reference changed,
+                              or a slug now matches a different file
+      - input/              → new or edited context files
+      - build.log           → slugs that newly fail the build
+
+    Prompt files are compared once generated/prompts/ has been quiet for
+    a poll, so a full rewrite by generate-prompts.js (delete + recreate)
+    only queues the slugs whose prompt really changed. The queue is
+    drained once a poll finds no further changes.
+    """
+
+    def __init__(self, client: OpenAI, poll_interval: float = WATCH_POLL_INTERVAL) -> None:
+        self.client = client
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+
+        # slug -> reason; dict keeps insertion order and deduplicates
+        self.queue: Dict[str, str] = {}
+        # generated slugs whose date could not be written to calc.csv yet
+        self.pending_marks: List[str] = []
+
+        self.rows: List[List[str]] = []
+        self.slug_index: Dict[str, int] = {}  # slug -> data-row index
+        self.row_signatures: Dict[str, Tuple[str, ...]] = {}
+        self.build_log: Optional[str] = None
+        self.failing_slugs: Set[str] = set()
+
+        # slug -> prompt file, as chosen by find_best_prompt_file_for_row
+        self.prompt_for_slug: Dict[str, Path] = {}
+        self.match_errors: Dict[str, str] = {}
+        # prompt file -> (hash, context folder), see prompt_file_signature
+        self.prompt_info: Dict[Path, Tuple[str, Optional[str]]] = {}
+
+        self.csv_mtime: Optional[float] = None
+        self.build_log_mtime: Optional[float] = None
+        self.prompt_mtimes: Dict[Path, float] = {}
+        self.settled_prompt_mtimes: Dict[Path, float] = {}
+        self.prompts_dirty = False
+        self.input_mtimes: Dict[Path, float] = {}
+
+        self.status: Dict[str, Any] = {
+            "state": "starting",
+            "pid": os.getpid(),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "last_poll_at": None,
+            "current_slug": None,
+            "queue": [],
+            "processed": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "recent": [],
+        }
+
+    # --- state loading ---
+
+    def load_csv(self) -> None:
+        rows = load_csv_rows(CSV_PATH)
+        self.rows = rows
+        self.slug_index = {}
+        self.row_signatures = {}
+        for idx, row in enumerate(get_data_rows(rows)):
+            slug = extract_slug_from_row(row)
+            if slug and slug not in self.slug_index:
+                self.slug_index[slug] = idx
+                self.row_signatures[slug] = row_signature(row)
+        self.csv_mtime = file_mtime(CSV_PATH)
+
+    def compute_failing_slugs(self) -> Set[str]:
+        if self.build_log is None:
+            return set()
+        return {s for s in self.slug_index if slug_has_build_error(self.build_log, s)}
+
+    def resolve_prompt(self, slug: str) -> Optional[Path]:
+        """
+        Match a slug to its prompt file and remember the result.
+        Nothing is written to disk: the input/ placeholder is only created
+        when the slug is actually generated (see regenerate).
+        """
+        row = self.rows[self.slug_index[slug] + 1]  # +1 because of header
+
+        try:
+            prompt_file = find_best_prompt_file_for_row(
+                slug, row, PROMPTS_DIR, INPUT_DIR, create_placeholder=False
+            )
+        except (RuntimeError, FileNotFoundError) as e:
+            self.prompt_for_slug.pop(slug, None)
+            self.match_errors[slug] = str(e)
+            return None
+
+        self.prompt_for_slug[slug] = prompt_file
+        self.match_errors.pop(slug, None)
+        return prompt_file
+
+    def rebuild_prompt_map(self) -> None:
+        for slug in self.slug_index:
+            self.resolve_prompt(slug)
+        if self.match_errors:
+            print(f"[watch] WARNING: {len(self.match_errors)} slugs have no matching prompt file.")
+
+    def slugs_to_rematch(self, added: Set[Path], removed: Set[Path]) -> Set[str]:
+        """
+        Slugs whose best prompt file may move when files are added/removed.
+
+        Follows the priority of find_best_prompt_file_for_row: a direct match
+        (slug in the file name) only moves if its file is gone or a new file
+        name also contains the slug. Exact-name and fuzzy matches, and
+        unmatched slugs, can be taken over by any new file.
+        """
+        added_stems = [p.stem.lower() for p in added]
+        affected: Set[str] = set()
+        for slug in self.slug_index:
+            slug_plain = slug.lower()
+            current = self.prompt_for_slug.get(slug)
+            if (
+                current is None
+                or current in removed
+                or slug_plain not in current.stem.lower()
+                or any(slug_plain in stem for stem in added_stems)
+            ):
+                affected.add(slug)
+        return affected
+
+    def context_folder(self, slug: str) -> Optional[str]:
+        prompt_file = self.prompt_for_slug.get(slug)
+        if prompt_file is None:
+            return None
+        return self.prompt_info.get(prompt_file, ("", None))[1]
+
+    def load_all(self) -> None:
+        """Load every index and take the baseline snapshot (nothing is queued)."""
+        self.load_csv()
+        self.build_log = load_build_log(BUILD_LOG_PATH)
+        self.build_log_mtime = file_mtime(BUILD_LOG_PATH)
+        self.failing_slugs = self.compute_failing_slugs()
+
+        self.prompt_mtimes = scan_mtimes(PROMPTS_DIR, "*.json")
+        self.settled_prompt_mtimes = dict(self.prompt_mtimes)
+        self.prompt_info = {p: prompt_file_signature(p) for p in self.prompt_mtimes}
+
+        self.rebuild_prompt_map()
+        self.input_mtimes = scan_mtimes(INPUT_DIR)
+
+    # --- change detection ---
+
+    def enqueue(self, slug: str, reason: str) -> None:
+        with self.lock:
+            if slug not in self.queue:
+                self.queue[slug] = reason
+                print(f"[watch] queued {slug} ({reason})")
+
+    def reload_csv(self) -> bool:
+        """
+        Reload calc.csv and queue new or edited rows.
+        Returns False (state unchanged) if the file could not be read.
+        """
+        previous = self.row_signatures
+        try:
+            self.load_csv()
+        except (OSError, ValueError, csv.Error) as e:
+            # half-written file: retry on the next poll
+            print(f"[watch] WARNING: could not reload {CSV_PATH}: {e}")
+            return False
+
+        for slug in list(self.prompt_for_slug):
+            if slug not in self.slug_index:
+                del self.prompt_for_slug[slug]
+
+        for slug, signature in self.row_signatures.items():
+            if slug not in previous:
+                reason = "new row in calc.csv"
+            elif previous[slug] != signature:
+                reason = "row edited in calc.csv"
+            else:
+                continue
+            # category/subcategory may have changed the match
+            self.resolve_prompt(slug)
+            self.enqueue(slug, reason)
+
+        # keep the build-log baseline aligned with the new slug set
+        self.failing_slugs = self.compute_failing_slugs()
+        return True
+
+    def poll_csv(self) -> int:
+        mtime = file_mtime(CSV_PATH)
+        if mtime is None or mtime == self.csv_mtime:
+            return 0
+        self.reload_csv()
+        return 1
+
+    def settle_prompts(self) -> None:
+        """Compare generated/prompts/ with the last settled state and queue real changes."""
+        old_info = self.prompt_info
+        new_info: Dict[Path, Tuple[str, Optional[str]]] = {}
+        for p, mtime in self.prompt_mtimes.items():
+            if p in old_info and self.settled_prompt_mtimes.get(p) == mtime:
+                new_info[p] = old_info[p]
+            else:
+                new_info[p] = prompt_file_signature(p)
+
+        old_map = dict(self.prompt_for_slug)
+        added = new_info.keys() - old_info.keys()
+        removed = old_info.keys() - new_info.keys()
+        if added or removed:
+            # files added/removed: the best match may have moved
+            for slug in self.slugs_to_rematch(added, removed):
+                self.resolve_prompt(slug)
+
+        self.prompt_info = new_info
+        self.settled_prompt_mtimes = dict(self.prompt_mtimes)
+
+        for slug in self.slug_index:
+            prompt_file = self.prompt_for_slug.get(slug)
+            if prompt_file is None:
+                continue
+            if old_map.get(slug) != prompt_file:
+                self.enqueue(slug, f"now matches prompt {prompt_file.name}")
+            elif old_info.get(prompt_file) != new_info.get(prompt_file):
+                self.enqueue(slug, f"prompt changed: {prompt_file.name}")
+
+    def poll_prompts(self) -> int:
+        current = scan_mtimes(PROMPTS_DIR, "*.json")
+        if current != self.prompt_mtimes:
+            self.prompt_mtimes = current
+            self.prompts_dirty = True
+            return 1
+        if self.prompts_dirty:
+            self.prompts_dirty = False
+            self.settle_prompts()
+        return 0
+
+    def poll_inputs(self) -> int:
+        current = scan_mtimes(INPUT_DIR)
+        changed = {p for p, m in current.items() if self.input_mtimes.get(p) != m}
+        changed |= self.input_mtimes.keys() - current.keys()
+        self.input_mtimes = current
+
+        folders: Set[str] = set()
+        for p in changed:
+            try:
+                folders.add(p.relative_to(INPUT_DIR).parts[0])
+            except (ValueError, IndexError):
+                continue
+
+        for slug in self.slug_index:
+            folder = self.context_folder(slug)
+            if folder in folders:
+                self.enqueue(slug, f"context changed: {INPUT_DIR / folder}")
+        return len(changed)
+
+    def poll_build_log(self) -> int:
+        mtime = file_mtime(BUILD_LOG_PATH)
+        if mtime == self.build_log_mtime:
+            return 0
+
+        self.build_log_mtime = mtime
+        self.build_log = load_build_log(BUILD_LOG_PATH)
+        failing = self.compute_failing_slugs()
+        for slug in sorted(failing - self.failing_slugs):
+            self.enqueue(slug, "newly failing in build log")
+        self.failing_slugs = failing
+        return 1
+
+    def poll(self) -> int:
+        """Check every watched source; return how many changes were seen."""
+        changes = (
+            self.poll_csv()
+            + self.poll_prompts()
+            + self.poll_inputs()
+            + self.poll_build_log()
+        )
+        with self.lock:
+            self.status["last_poll_at"] = datetime.now().isoformat(timespec="seconds")
+        return changes
+
+    # --- processing ---
+
+    def record_result(self, slug: str, ok: bool, detail: str) -> None:
+        with self.lock:
+            self.status["processed"] += 1
+            self.status["succeeded" if ok else "failed"] += 1
+            self.status["recent"].insert(0, {
+                "slug": slug,
+                "ok": ok,
+                "detail": detail,
+                "at": datetime.now().isoformat(timespec="seconds"),
+            })
+            del self.status["recent"][WATCH_RECENT_RESULTS:]
+
+    def regenerate(self, slug: str, reason: str) -> Tuple[bool, bool]:
+        """Regenerate one slug; return (config saved, row can be marked as built)."""
+        print("\n" + "-" * 60)
+        print(f"[watch] {slug}: {reason}")
+
+        idx = self.slug_index.get(slug)
+        if idx is None:
+            self.record_result(slug, False, "slug no longer in calc.csv")
+            return False, False
+        row = self.rows[idx + 1]  # +1 because of header
+
+        prompt_file = self.prompt_for_slug.get(slug) or self.resolve_prompt(slug)
+        if prompt_file is None:
+            error = self.match_errors.get(slug, "no matching prompt file")
+            print(f"  -> ERROR for slug '{slug}': {error}")
+            self.record_result(slug, False, error)
+            return False, False
+
+        try:
+            placeholder = INPUT_DIR / slug / "manifest.json"
+            if not placeholder.parent.exists():
+                ensure_input_placeholder(INPUT_DIR, slug)
+                # our own write, not a context edit
+                mtime = file_mtime(placeholder)
+                if mtime is not None:
+                    self.input_mtimes[placeholder] = mtime
+
+            output_path = generate_config_for_slug(self.client, slug, row, prompt_file)
+        except Exception as e:
+            # unlike batch mode, a bad slug must not stop the daemon
+            print(f"  -> ERROR for slug '{slug}': {e}")
+            self.record_result(slug, False, str(e))
+            return False, False
+
+        if output_path is None:
+            self.record_result(slug, False, "generation skipped, see log")
+            return False, False
+
+        self.record_result(slug, True, str(output_path))
+
+        if self.build_log is None:
+            print("  -> No build log loaded; skipping success marking for this row.")
+            return True, False
+        if slug_has_build_error(self.build_log, slug):
+            print("  -> Build error detected for this slug in build log.")
+            return True, False
+        print("  -> No build error found for this slug in build log. Marking as OK.")
+        return True, True
+
+    def mark_built(self, slugs: List[str]) -> None:
+        """
+        Write today's date for the given slugs in calc.csv.
+        On any failure the slugs are kept in pending_marks for the next pass.
+        """
+        # pick up edits made while we were generating before rewriting the CSV
+        if file_mtime(CSV_PATH) != self.csv_mtime and not self.reload_csv():
+            print("[watch] calc.csv not readable; date marking postponed to the next pass.")
+            self.pending_marks = slugs
+            return
+
+        indices = [self.slug_index[s] for s in slugs if s in self.slug_index]
+        try:
+            mark_rows_as_built(self.rows, indices)
+            self.load_csv()
+        except Exception as e:
+            print(f"[watch] WARNING: could not update {CSV_PATH}: {e}. Retrying on the next pass.")
+            self.pending_marks = slugs
+
+    def process_queue(self) -> None:
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+        built: List[str] = self.pending_marks
+        self.pending_marks = []
+        generated: List[str] = []
+        while True:
+            with self.lock:
+                if not self.queue:
+                    self.status["current_slug"] = None
+                    break
+                slug, reason = next(iter(self.queue.items()))
+                del self.queue[slug]
+                self.status["state"] = "processing"
+                self.status["current_slug"] = slug
+            self.write_status()
+
+            saved, ok_to_mark = self.regenerate(slug, reason)
+            if saved:
+                generated.append(slug)
+            if ok_to_mark:
+                built.append(slug)
+
+        if built:
+            self.mark_built(list(dict.fromkeys(built)))
+
+        if generated:
+            print("\nRunning git add/commit/push ...")
+            try:
+                run_git_commands(f"watch: {', '.join(generated)}")
+            except Exception as e:
+                print(f"[watch] WARNING: git step failed: {e}")
+
+    # --- status ---
+
+    def status_snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            snapshot = dict(self.status)
+            snapshot["queue"] = [{"slug": s, "reason": r} for s, r in self.queue.items()]
+            snapshot["recent"] = list(self.status["recent"])
+        return snapshot
+
+    def write_status(self) -> None:
+        tmp_path = STATUS_PATH.with_suffix(STATUS_PATH.suffix + ".tmp")
+        try:
+            tmp_path.write_text(json.dumps(self.status_snapshot(), indent=2), encoding="utf-8")
+            tmp_path.replace(STATUS_PATH)
+        except OSError as e:
+            print(f"[watch] WARNING: could not write status file {STATUS_PATH}: {e}")
+
+    def serve_status(self, port: int) -> None:
+        """Expose the status as JSON on http://127.0.0.1:<port>/ in a background thread."""
+        daemon = self
+
+        class StatusHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = json.dumps(daemon.status_snapshot(), indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass  # keep the console for the pipeline output
+
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), StatusHandler)
+        except OSError as e:
+            print(f"[watch] WARNING: could not serve status on port {port}: {e}. "
+                  f"Status is still written to {STATUS_PATH}.")
+            return
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[watch] Status endpoint: http://127.0.0.1:{port}/")
+
+    # --- main loop ---
+
+    def run(self) -> None:
+        self.load_all()
+        print(
+            f"[watch] Watching {CSV_PATH}, {PROMPTS_DIR}/, {INPUT_DIR}/ and {BUILD_LOG_PATH} "
+            f"every {self.poll_interval}s ({len(self.slug_index)} slugs). Ctrl+C to stop."
+        )
+        with self.lock:
+            self.status["state"] = "idle"
+        self.write_status()
+
+        try:
+            while True:
+                changes = self.poll()
+                # wait for a quiet poll so bursts of writes land in one batch
+                if changes == 0 and (self.queue or self.pending_marks):
+                    self.process_queue()
+                    with self.lock:
+                        self.status["state"] = "idle"
+                self.write_status()
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            print("\n[watch] Stopping.")
+        finally:
+            with self.lock:
+                self.status["state"] = "stopped"
+            self.write_status()
+
+
+def run_watch_mode(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(
+        prog="factory_runner.py --watch",
+        description="Keep running and regenerate only the slugs affected by changes.",
+    )
+    parser.add_argument("--interval", type=float, default=WATCH_POLL_INTERVAL,
+                        help="seconds between polls (default: %(default)s)")
+    parser.add_argument("--status-port", type=int, default=None,
+                        help="also serve the status JSON on 127.0.0.1:PORT")
+    args = parser.parse_args(argv)
+
+    # One client for the whole session: its HTTP connection pool stays warm
+    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+    daemon = FactoryDaemon(client, poll_interval=args.interval)
+    if args.status_port is not None:
+        daemon.serve_status(args.status_port)
+    daemon.run()
+
+
 # ------------ MAIN LOGIC ------------
 
 def main() -> None:
+    # Watch mode: python factory_runner.py --watch [--interval N] [--status-port P]
+    if len(sys.argv) > 1 and sys.argv[1] == "--watch":
+        run_watch_mode(sys.argv[2:])
+        return
+
     # Determine starting row and optional number of rows
     if len(sys.argv) > 1:
         try:
@@ -532,85 +1239,15 @@ def main() -> None:
         print(f"  -> Slug detected: {slug}")
 
         try:
-            prompt_file = find_best_prompt_file_for_row(slug, row, PROMPTS_DIR, INPUT_DIR)
+            output_path = generate_config_for_slug(client, slug, row)
         except RuntimeError as e:
             print(f"  -> FATAL matching error for slug '{slug}': {e}")
             print("     Interrompo lo script: sistema prompt/zip e rilancia.")
             sys.exit(1)
 
-        print(f"  -> Using prompt file: {prompt_file}")
-
-        try:
-            prompt_json = load_json(prompt_file)
-        except Exception as e:
-            print(f"  -> ERROR loading JSON from {prompt_file}: {e}")
+        if output_path is None:
             continue
 
-        prompt_text = prompt_json.get("prompt")
-        if not prompt_text or not isinstance(prompt_text, str):
-            print(f"  -> No 'prompt' field found in JSON {prompt_file}. Skipping.")
-            continue
-
-        zip_str = find_zip_path_in_json(prompt_json)
-        context_files: List[Path] = []
-
-        if zip_str:
-            norm = zip_str.strip()
-
-            # ALWAYS convert "../input/xyz.zip" → "./input/xyz/"
-            if norm.startswith("../input/"):
-                base = norm[len("../input/"):]
-            else:
-                base = Path(norm).name  # fallback: take only last part
-
-            folder_name = base.replace(".zip", "")  # "xyz.zip" → "xyz"
-            folder_path = Path.cwd() / INPUT_DIR / folder_name
-
-            if folder_path.exists() and folder_path.is_dir():
-                print(f"  -> Using folder for context: {folder_path}")
-                # Collect all supported files inside folder
-                for p in folder_path.rglob("*"):
-                    if p.is_file() and p.suffix.lower() in SUPPORTED_CONTEXT_EXTENSIONS:
-                        context_files.append(p)
-                        print(f"     + Adding context file: {p.name}")
-            else:
-                print(f"  -> Folder not found: {folder_path}. No context files added.")
-        else:
-            print("  -> No zip reference found; using prompt only.")
-
-        try:
-            raw_output = call_openai_with_prompt_and_context_files(client, prompt_text, context_files)
-        except Exception as e:
-            print(f"  -> ERROR calling OpenAI for slug '{slug}': {e}")
-            continue
-
-        cleaned_json_str = extract_json_block_with_version(raw_output)
-
-        if cleaned_json_str is None:
-            debug_path = OUTPUT_DIR / f"{slug}_raw_output.txt"
-            with debug_path.open("w", encoding="utf-8") as f:
-                f.write(raw_output)
-            print('  -> ERROR: No JSON block with "version" found in model output.')
-            print(f"     Full model output saved to: {debug_path}")
-            print("     Controlla cosa sta producendo il modello e sistema il prompt per forzare un JSON valido.")
-            continue
-
-        # Validate JSON structure
-        try:
-            parsed = json.loads(cleaned_json_str)
-        except Exception as e:
-            print(f"  -> ERROR: Extracted text is not valid JSON: {e}")
-            print("     Skipping save for this slug – fix prompt or model output and retry.")
-            continue
-        else:
-            output_text_to_save = json.dumps(parsed, indent=2, ensure_ascii=False)
-
-        output_path = OUTPUT_DIR / f"{slug}.json"
-        with output_path.open("w", encoding="utf-8") as f:
-            f.write(output_text_to_save)
-
-        print(f"  -> Saved config to {output_path}")
-
         # If we have a build log, check whether this slug had a build error
         if build_log is not None:
             has_error = slug_has_build_error(build_log, slug)
@@ -625,26 +1262,7 @@ def main() -> None:
 
     # Update calc.csv dates (only for rows without build error)
     if successful_row_indices and build_log is not None:
-        today_str = date.today().strftime("%m/%d/%Y")
-
-        print("\nUpdating calc.csv for successful rows with date:", today_str)
-
-        # rows = [header, *data_rows]; data_rows indexes must be shifted by 1
-        for idx in successful_row_indices:
-            csv_row_index = idx + 1  # +1 because of header
-            row = rows[csv_row_index]
-
-            # Ensure the row has at least DATE_COLUMN_INDEX+1 elements
-            if len(row) <= DATE_COLUMN_INDEX:
-                # Extend with empty strings if needed
-                row.extend([""] * (DATE_COLUMN_INDEX + 1 - len(row)))
-
-            row[DATE_COLUMN_INDEX] = today_str
-            rows[csv_row_index] = row
-            print(f"  -> Row {idx + 1} (data row) updated, column 9 set to {today_str}")
-
-        write_csv_rows(rows, CSV_PATH)
-        print("calc.csv updated.")
+        mark_rows_as_built(rows, successful_row_indices)
     else:
         if build_log is None:
             print("\ncalc.csv not updated (no build log available).")
@@ -653,7 +1271,7 @@ def main() -> None:
 
     # After processing, run git commands
     print("\nRunning git add/commit/push ...")
-    run_git_commands(start_row_number)
+    run_git_commands(f"row {start_row_number}")
 
     print("Done.")
 
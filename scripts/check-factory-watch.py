@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Scripted check for factory_runner.py --watch change detection.
+
+Builds a small calc.csv / generated/prompts / input / build.log tree in a
+temporary directory, drives FactoryDaemon.poll() and process_queue() with
+a stub OpenAI client (no network, no git push) and checks which slugs get
+queued for each kind of change.
+
+Usage (from the project root, inside the venv used for factory_runner):
+
+  python scripts/check-factory-watch.py
+
+The OpenAI client is stubbed, but factory_runner itself imports dotenv
+and openai at import time: without that venv the script stops with
+ModuleNotFoundError.
+"""
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Set
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import factory_runner as fr  # noqa: E402
+
+HEADER = ("category,subcategory,slug,title,traffic_estimate,New_Publish_Date,"
+          "component_type,config_json,creation_date,revision1_date,revision2_date")
+ROWS = [
+    "Finance,Loans,/finance/loans/business-loan-apr-calculator,Business Loan APR,10,,,,,,",
+    "Finance,Loans,/finance/loans/business-loan-apr-calculator-with-bi-weekly-payments,Bi-weekly APR,10,,,,,,",
+    "Business,Accounting,/business/accounting/calculate-price-elasticity,Price Elasticity,10,,,,,,",
+]
+PROMPTS = {
+    # slug is a substring of the bi-weekly file name: edits must not cross over
+    "finance_loans_business-loan-apr-calculator.json": "business-loan-apr-calculator",
+    "finance_loans_business-loan-apr-calculator-with-bi-weekly-payments.json":
+        "business-loan-apr-calculator-with-bi-weekly-payments",
+    # matched by the exact-name rule, context folder not named after the slug
+    "business_accounting_price-elasticity-calculator.json": "price-elasticity",
+    "finance_loans_new-row-calculator.json": "new-row-calculator",
+}
+
+_mtime_clock = time.time()
+
+
+def bump_mtime(path: Path) -> None:
+    """Give path a strictly newer mtime, whatever the filesystem resolution."""
+    global _mtime_clock
+    _mtime_clock += 10
+    os.utime(path, (_mtime_clock, _mtime_clock))
+
+
+def write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    bump_mtime(path)
+
+
+def prompt_json(folder: str, text: str = "Build the calculator.") -> str:
+    return json.dumps({"prompt": text, "zip": f"../input/{folder}.zip"}, indent=2)
+
+
+def write_csv(rows: List[str]) -> None:
+    write(fr.CSV_PATH, "\n".join([HEADER, *rows]) + "\n")
+
+
+class StubResponses:
+    def __init__(self) -> None:
+        self.on_call: Optional[Callable[[], None]] = None
+
+    def create(self, **kwargs):
+        if self.on_call is not None:
+            self.on_call()
+
+        class Result:
+            output_text = '{"version": "1.0"}'
+        return Result()
+
+
+class StubClient:
+    def __init__(self) -> None:
+        self.responses = StubResponses()
+
+
+def setup_tree() -> None:
+    write_csv(ROWS)
+    for name, folder in PROMPTS.items():
+        write(fr.PROMPTS_DIR / name, prompt_json(folder))
+        # no folder for new-row-calculator: generating it creates a placeholder
+        if folder != "new-row-calculator":
+            write(fr.INPUT_DIR / folder / "manifest.json", '{"results":[]}')
+    write(fr.BUILD_LOG_PATH, "12:00:00.000 Collecting page data ...\n")
+
+
+def queued_after_poll(daemon: fr.FactoryDaemon) -> Set[str]:
+    # second poll is the quiet one that settles generated/prompts/
+    daemon.poll()
+    daemon.poll()
+    slugs = set(daemon.queue)
+    daemon.queue.clear()
+    return slugs
+
+
+def main() -> int:
+    os.environ["SKIP_GIT_PUSH"] = "1"
+    failures = 0
+
+    def check(name: str, got: object, expected: object) -> None:
+        nonlocal failures
+        if got == expected:
+            print(f"ok   - {name}")
+        else:
+            failures += 1
+            print(f"FAIL - {name}: expected {expected!r}, got {got!r}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            setup_tree()
+
+            client = StubClient()
+            daemon = fr.FactoryDaemon(client, poll_interval=0)
+            daemon.load_all()
+            check("indexing creates no input/ placeholders",
+                  (fr.INPUT_DIR / "calculate-price-elasticity").exists(), False)
+
+            check("baseline queues nothing", queued_after_poll(daemon), set())
+            check(
+                "exact-name rule match is indexed at startup",
+                daemon.prompt_for_slug.get("calculate-price-elasticity"),
+                fr.PROMPTS_DIR / "business_accounting_price-elasticity-calculator.json",
+            )
+
+            rows = ROWS + ["Finance,Loans,/finance/loans/new-row-calculator,New,10,,,,,,"]
+            write_csv(rows)
+            check("new row", queued_after_poll(daemon), {"new-row-calculator"})
+            check("matching a new row creates no placeholder",
+                  (fr.INPUT_DIR / "new-row-calculator").exists(), False)
+            daemon.enqueue("new-row-calculator", "check")
+            daemon.process_queue()
+            check("generating creates the placeholder",
+                  (fr.INPUT_DIR / "new-row-calculator" / "manifest.json").exists(), True)
+            check("placeholder input/ folder is not a context edit", queued_after_poll(daemon), set())
+
+            rows[0] = rows[0].replace("Business Loan APR", "Business Loan APR Calculator")
+            write_csv(rows)
+            check("edited row", queued_after_poll(daemon), {"business-loan-apr-calculator"})
+
+            rows[1] = rows[1].replace(",,,,,,", ",,,,01/01/2025,,")
+            write_csv(rows)
+            check("date column only is not an edit", queued_after_poll(daemon), set())
+
+            write(fr.PROMPTS_DIR / "finance_loans_business-loan-apr-calculator-with-bi-weekly-payments.json",
+                  prompt_json("business-loan-apr-calculator-with-bi-weekly-payments", "Edited prompt."))
+            check("edited prompt queues only its matched slug", queued_after_poll(daemon),
+                  {"business-loan-apr-calculator-with-bi-weekly-payments"})
+
+            write(fr.PROMPTS_DIR / "business_accounting_price-elasticity-calculator.json",
+                  prompt_json("price-elasticity", "Edited prompt."))
+            check("edited prompt matched by exact-name rule", queued_after_poll(daemon),
+                  {"calculate-price-elasticity"})
+
+            write(fr.INPUT_DIR / "price-elasticity" / "manifest.json", '{"results":[1]}')
+            check("edited context file", queued_after_poll(daemon), {"calculate-price-elasticity"})
+
+            with fr.BUILD_LOG_PATH.open("a", encoding="utf-8") as f:
+                f.write("12:00:01.000 Error: config file finance/loans/business-loan-apr-calculator: bad\n")
+            bump_mtime(fr.BUILD_LOG_PATH)
+            check("newly failing build-log line", queued_after_poll(daemon), {"business-loan-apr-calculator"})
+
+            # generate-prompts.js style: delete everything, poll mid-burst, recreate identical files
+            contents = {p: p.read_text(encoding="utf-8") for p in fr.PROMPTS_DIR.glob("*.json")}
+            for p in contents:
+                p.unlink()
+            daemon.poll()
+            for p, text in contents.items():
+                write(p, text)
+            check("no-op rewrite of every prompt file", queued_after_poll(daemon), set())
+
+            # a new file named after the slug beats its exact-name match
+            direct = fr.PROMPTS_DIR / "business_accounting_calculate-price-elasticity.json"
+            write(direct, prompt_json("price-elasticity"))
+            check("added prompt file re-matches the slug", queued_after_poll(daemon),
+                  {"calculate-price-elasticity"})
+            check("re-match uses the new file", daemon.prompt_for_slug.get("calculate-price-elasticity"),
+                  direct)
+            direct.unlink()
+            check("removed prompt file re-matches the slug", queued_after_poll(daemon),
+                  {"calculate-price-elasticity"})
+            check("no input/ placeholders from re-matching",
+                  (fr.INPUT_DIR / "calculate-price-elasticity").exists(), False)
+
+            # context edit while a batch is generating is still picked up afterwards
+            context = fr.INPUT_DIR / "business-loan-apr-calculator" / "manifest.json"
+            client.responses.on_call = lambda: write(context, '{"results":[2]}')
+            daemon.enqueue("calculate-price-elasticity", "check")
+            daemon.process_queue()
+            client.responses.on_call = None
+            check("context edit during a batch", queued_after_poll(daemon), {"business-loan-apr-calculator"})
+
+            # calc.csv half-written at marking time: nothing is overwritten, marks are retried
+            client.responses.on_call = lambda: write(fr.CSV_PATH, "")
+            daemon.enqueue("calculate-price-elasticity", "check")
+            daemon.process_queue()
+            client.responses.on_call = None
+            check("unreadable calc.csv is not overwritten", fr.CSV_PATH.read_text(encoding="utf-8"), "")
+            check("marks kept for the next pass", daemon.pending_marks, ["calculate-price-elasticity"])
+
+            write_csv(rows)
+            daemon.poll()
+            daemon.process_queue()
+            marked = fr.load_csv_rows(fr.CSV_PATH)[3][fr.DATE_COLUMN_INDEX]
+            check("pending marks written once calc.csv is readable", bool(marked), True)
+            check("no pending marks left", daemon.pending_marks, [])
+
+            # status port already taken: warn and keep going with the status file
+            with socket.socket() as busy:
+                busy.bind(("127.0.0.1", 0))
+                busy.listen()
+                try:
+                    daemon.serve_status(busy.getsockname()[1])
+                    check("busy status port does not stop the daemon", True, True)
+                except OSError as e:
+                    check("busy status port does not stop the daemon", repr(e), None)
+        finally:
+            os.chdir(ROOT)
+
+    print(f"\n{'All checks passed.' if failures == 0 else f'{failures} check(s) failed.'}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())